@@ -1,15 +1,19 @@
 import os
-import json
+import math
+import hmac
 import uuid
+import time
 import socket
 import threading
-from datetime import datetime
-from pathlib import Path
 from functools import wraps
-from typing import Any, Dict, List, Tuple
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request
 from flask_cors import CORS
+import msgspec
+
+import db
+from models import Order, OrderItem, Product, canon, canon_status
 
 app = Flask(__name__)
 CORS(app)
@@ -18,22 +22,24 @@ CORS(app)
 # Config
 # -----------------------------
 API_KEY = os.getenv("API_KEY", "CHANGE_ME")
+API_KEY_B = API_KEY.encode()
 INSTANCE_NAME = os.getenv("INSTANCE_NAME", socket.gethostname())
 PORT = int(os.getenv("PORT", "5000"))
+# How often (seconds) to ask SQLite whether another process has written
+CACHE_CHECK_INTERVAL = float(os.getenv("CACHE_CHECK_INTERVAL", "0.05"))
 
-BASE_DIR = Path(__file__).resolve().parent
-DATA_DIR = BASE_DIR / "data"
-DATA_DIR.mkdir(exist_ok=True)
-
-# You can override the DB file path if needed:
-#   set DB_PATH=C:\path\to\db.json
-DB_PATH = Path(os.getenv("DB_PATH", str(DATA_DIR / "db.json")))
 
-_lock = threading.Lock()
+# (unix second, "YYYY-MM-DDTHH:MM:SS") - strftime only runs once per second
+_TS_CACHE = (-1, "")
 
 
 def now_iso() -> str:
-    return datetime.utcnow().isoformat() + "Z"
+    global _TS_CACHE
+    secs, micros = divmod(time.time_ns() // 1000, 1_000_000)
+    ts = _TS_CACHE
+    if ts[0] != secs:
+        ts = _TS_CACHE = (secs, time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(secs)))
+    return f"{ts[1]}.{micros:06d}Z"
 
 
 # -----------------------------
@@ -43,49 +49,166 @@ def require_api_key(f):
     @wraps(f)
     def decorated(*args, **kwargs):
         provided = request.headers.get("X-API-Key", "")
-        if not provided or provided != API_KEY:
-            return jsonify({"error": "Unauthorized", "message": "Missing or invalid API key"}), 401
+        if not provided or not hmac.compare_digest(provided.encode(), API_KEY_B):
+            return json_response({"error": "Unauthorized", "message": "Missing or invalid API key"}, 401)
         return f(*args, **kwargs)
     return decorated
 
 
 # -----------------------------
-# DB helpers (db.json format)
-# db.json structure (your file):
-# {
-#   "products":[{"id":"p1","name":"Notebook","price":12.5,"createdAt":"..."}],
-#   "orders":[{"id":"o1","customer":"Fatima","items":[{"productId":"p1","qty":2}],"status":"NEW","createdAt":"..."}]
-# }
+# In-memory cache of the DB (persistence lives in db.py)
+# _CACHE["db"] is one snapshot: the products/orders lists plus by-id
+# indexes over the same objects, as of commit number _CACHE["version"]
+# (db.read_seq()). It is replaced as a whole (a single reference store)
+# when another process has committed to the SQLite file, so readers need no
+# lock and never see lists and indexes out of step.
+# Writers do their checks in SQL inside db.write(); after COMMIT, write()
+# below mirrors the change in the current snapshot, then they respond.
+# GET /products serves pre-encoded JSON, tagged with the generation it was
+# built from; touch() bumps the generation after every change. GET /orders
+# (the big one) is streamed instead, see stream_list().
 # -----------------------------
-def ensure_db_exists():
-    if not DB_PATH.exists():
-        DB_PATH.write_text(json.dumps({"products": [], "orders": []}, indent=2), encoding="utf-8")
-        return
-    content = DB_PATH.read_text(encoding="utf-8").strip()
-    if content == "":
-        DB_PATH.write_text(json.dumps({"products": [], "orders": []}, indent=2), encoding="utf-8")
+_CACHE: Dict[str, Any] = {
+    "db": None, "version": None, "checked_at": 0.0,
+    "products_gen": 0, "products_json": (b"", -1)
+}
+_gen_lock = threading.Lock()
+# Held while the snapshot is changed or swapped; readers never take it
+_cache_lock = threading.Lock()
+# One thread at a time rebuilds the snapshot
+_reload_lock = threading.Lock()
+
+# Records per chunk when streaming a list response
+STREAM_CHUNK = 500
+
+
+def load_db(force: bool = False) -> Dict[str, Any]:
+    """Returns the current snapshot, reloading it first if it went stale.
+
+    Readers ask SQLite at most once per CACHE_CHECK_INTERVAL; force=True asks
+    right away. Reloads read on db.py's per-thread read connections, so they
+    never wait on a writer.
+    """
+    now = time.monotonic()
+    if not force and _CACHE["db"] is not None and now - _CACHE["checked_at"] < CACHE_CHECK_INTERVAL:
+        return _CACHE["db"]
+
+    _CACHE["checked_at"] = now
+    if _CACHE["db"] is None or db.read_seq() != _CACHE["version"]:
+        with _reload_lock:
+            # Another thread may have reloaded while we waited
+            if _CACHE["db"] is None or db.read_seq() != _CACHE["version"]:
+                seq, products, orders = db.snapshot()
+                products_by_id = index_by_id(products)
+                for o in orders:
+                    share_product_ids(o.items, products_by_id)
+                with _cache_lock:
+                    # A write in this process may have moved the snapshot past seq meanwhile
+                    if _CACHE["db"] is None or seq > _CACHE["version"]:
+                        _CACHE["db"] = {
+                            "products": products,
+                            "orders": orders,
+                            "products_by_id": products_by_id,
+                            "orders_by_id": index_by_id(orders)
+                        }
+                        _CACHE["version"] = seq
+                        touch("products")
+    return _CACHE["db"]
+
+
+def write(job: Callable[[], Any], change: Callable[[Dict[str, Any]], None]) -> Any:
+    """db.write(job); once it commits, change(snapshot) mirrors it in the cache.
+
+    change only runs if the snapshot is exactly the state job wrote on top of.
+    If another worker committed in between, the snapshot is left stale
+    instead and the next load_db() reloads it.
+    """
+    def apply(seq: int, _result: Any) -> None:
+        with _cache_lock:
+            if _CACHE["version"] == seq:
+                change(_CACHE["db"])
+                _CACHE["version"] = seq + 1
+            else:
+                _CACHE["checked_at"] = float("-inf")
+
+    return db.write(job, apply)
+
+
+def touch(name: str) -> None:
+    """Marks a cached list as changed; call after mutating it."""
+    with _gen_lock:
+        _CACHE[name + "_gen"] += 1
+
+
+def list_json(name: str) -> bytes:
+    """Encoded list, re-encoded only after a change."""
+    # Read the generation before encoding, so a concurrent change can only
+    # leave a stale tag (forcing a re-encode), never stale bytes
+    gen = _CACHE[name + "_gen"]
+    raw, raw_gen = _CACHE[name + "_json"]
+    if raw_gen != gen:
+        raw = _encoder.encode(_CACHE["db"][name])
+        _CACHE[name + "_json"] = (raw, gen)
+    return raw
+
+
+def stream_list(items: List[Any]) -> Iterator[bytes]:
+    """Encodes a JSON array a chunk of records at a time.
+
+    Keeps memory flat for large lists instead of building the whole body.
+    """
+    yield b"["
+    for start in range(0, len(items), STREAM_CHUNK):
+        chunk = b",".join(_encoder.encode(it) for it in items[start:start + STREAM_CHUNK])
+        yield chunk if start == 0 else b"," + chunk
+    yield b"]"
+
+
+def index_by_id(items: List[Any]) -> Dict[str, Any]:
+    # ids are made strings on insert (and by the TEXT column), no coercion needed
+    return {it.id: it for it in items}
+
+
+def share_product_ids(items: List[OrderItem], products_by_id: Dict[str, Product]) -> None:
+    """Points each item at its product's own id string, so repeats share one.
+
+    Call only once the ids are validated; nothing a client sends is interned.
+    """
+    for it in items:
+        product = products_by_id.get(it.product_id)
+        if product is not None:
+            it.product_id = product.id
+
 
+# Schema setup runs once when db.py is imported; warm the cache here too,
+# so the first request doesn't pay for loading the whole DB
+load_db()
 
-def load_db() -> Dict[str, Any]:
-    ensure_db_exists()
-    data = json.loads(DB_PATH.read_text(encoding="utf-8"))
-    if "products" not in data or not isinstance(data["products"], list):
-        data["products"] = []
-    if "orders" not in data or not isinstance(data["orders"], list):
-        data["orders"] = []
-    return data
 
+# -----------------------------
+# Request helpers
+# -----------------------------
+_encoder = msgspec.json.Encoder()
 
-def save_db(data: Dict[str, Any]) -> None:
-    DB_PATH.write_text(json.dumps(data, indent=2), encoding="utf-8")
 
+def raw_response(raw: bytes, status: int = 200) -> Response:
+    return Response(raw, status=status, mimetype="application/json")
 
-def index_by_id(items: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
-    out = {}
-    for it in items:
-        if isinstance(it, dict) and "id" in it:
-            out[str(it["id"])] = it
-    return out
+
+def json_response(obj: Any, status: int = 200) -> Response:
+    return raw_response(_encoder.encode(obj), status)
+
+
+def encode_record(obj: Any) -> Optional[bytes]:
+    """Encodes a record before it is stored; None if its text isn't valid UTF-8.
+
+    Lone surrogates (e.g. "\\ud800" in the request JSON) can't be stored or
+    served, so they must be rejected before the record reaches the cache.
+    """
+    try:
+        return _encoder.encode(obj)
+    except UnicodeEncodeError:
+        return None
 
 
 def get_body() -> Dict[str, Any]:
@@ -93,26 +216,90 @@ def get_body() -> Dict[str, Any]:
     return b if isinstance(b, dict) else {}
 
 
+INVALID_TEXT = "Text fields must be valid UTF-8 (no lone surrogates)"
+
+
+INVALID_PRICE = "Field 'price' must be a finite number"
+
+
+def parse_price(value: Any) -> Optional[float]:
+    """float(value), or None if it isn't a number or is nan/inf.
+
+    SQLite stores NaN as NULL, so it must never reach the cache.
+    """
+    try:
+        price = float(value)
+    except Exception:
+        return None
+    return price if math.isfinite(price) else None
+
+
 def bad_request(msg: str):
-    return jsonify({"error": "Bad Request", "message": msg}), 400
+    return json_response({"error": "Bad Request", "message": msg}, 400)
 
 
 def not_found(msg: str):
-    return jsonify({"error": "Not Found", "message": msg}), 404
+    return json_response({"error": "Not Found", "message": msg}, 404)
+
+
+@app.errorhandler(db.DatabaseBusy)
+def database_busy(_e):
+    resp = json_response({"error": "Service Unavailable", "message": "Database is busy, try again"}, 503)
+    resp.headers["Retry-After"] = "1"
+    return resp
+
+
+def normalize_items(items: List[Any]) -> Tuple[List[OrderItem], str]:
+    """Validates order items; returns (items, "") or ([], error message)."""
+    normalized = []
+    for it in items:
+        if not isinstance(it, dict):
+            return [], "Each item must be an object with productId and qty"
+        product_id = str(it.get("productId", "")).strip()
+        if not product_id:
+            return [], "Each item must include productId"
+        try:
+            # Checked here since an unknown id is echoed in the error message
+            product_id.encode()
+        except UnicodeEncodeError:
+            return [], INVALID_TEXT
+        qty = it.get("qty")
+        if type(qty) is int:
+            # What JSON clients normally send; no conversion needed
+            qty_val = qty
+        else:
+            try:
+                qty_val = int(qty)
+            except Exception:
+                return [], "qty must be an integer"
+        if qty_val <= 0:
+            return [], "qty must be a positive integer"
+        normalized.append(OrderItem(product_id, qty_val))
+    return normalized, ""
+
+
+def check_products(items: List[OrderItem]) -> str:
+    """For write() jobs: an error message if an item's product doesn't exist."""
+    # Every productId is checked in a single query
+    missing = db.missing_products([x.product_id for x in items])
+    return f"productId does not exist: {missing[0]}" if missing else ""
 
 
 # -----------------------------
 # Unprotected health
 # -----------------------------
+# Everything except the timestamp is fixed for the life of the process
+_HEALTH = {
+    "status": "ok",
+    "instance_name": INSTANCE_NAME,
+    "hostname": socket.gethostname(),
+    "db_path": str(db.DB_PATH)
+}
+
+
 @app.get("/health")
 def health():
-    return jsonify({
-        "status": "ok",
-        "time": now_iso(),
-        "instance_name": INSTANCE_NAME,
-        "hostname": socket.gethostname(),
-        "db_path": str(DB_PATH)
-    }), 200
+    return json_response({**_HEALTH, "time": now_iso()})
 
 
 # =========================================================
@@ -121,9 +308,8 @@ def health():
 @app.get("/products")
 @require_api_key
 def list_products():
-    data = load_db()
-    products = data["products"]
-    return jsonify(products), 200
+    load_db()
+    return raw_response(list_json("products"))
 
 
 @app.post("/products")
@@ -138,41 +324,43 @@ def create_product():
     if price is None:
         return bad_request("Field 'price' is required")
 
-    try:
-        price_val = float(price)
-    except Exception:
-        return bad_request("Field 'price' must be a number")
-
-    with _lock:
-        data = load_db()
-        products = data["products"]
-        p_index = index_by_id(products)
-
-        # Allow custom id, else generate p-<uuid>
-        pid = str(body.get("id") or f"p-{uuid.uuid4().hex[:8]}")
-        if pid in p_index:
-            return bad_request("Product id already exists")
-
-        product = {
-            "id": pid,
-            "name": str(name),
-            "price": price_val,
-            "createdAt": now_iso()
-        }
-        products.append(product)
-        save_db(data)
-
-    return jsonify(product), 201
+    price_val = parse_price(price)
+    if price_val is None:
+        return bad_request(INVALID_PRICE)
+
+    # Allow custom id, else generate p-<uuid>
+    pid = str(body.get("id") or f"p-{uuid.uuid4().hex[:8]}")
+    product = Product(
+        id=pid,
+        name=canon(str(name)),
+        price=price_val,
+        created_at=now_iso()
+    )
+    raw = encode_record(product)
+    if raw is None:
+        return bad_request(INVALID_TEXT)
+
+    def add(data: Dict[str, Any]) -> None:
+        data["products"].append(product)
+        data["products_by_id"][pid] = product
+        touch("products")
+
+    # The primary key rejects a taken id, whichever worker took it
+    if not write(lambda: db.insert_product(product), add):
+        return bad_request("Product id already exists")
+    return raw_response(raw, 201)
 
 
 @app.get("/products/<pid>")
 @require_api_key
 def get_product(pid: str):
-    data = load_db()
-    p_index = index_by_id(data["products"])
-    if pid not in p_index:
+    product = load_db()["products_by_id"].get(pid)
+    if product is None:
+        # It may have just been created by another worker; check before a 404
+        product = load_db(force=True)["products_by_id"].get(pid)
+    if product is None:
         return not_found("product not found")
-    return jsonify(p_index[pid]), 200
+    return json_response(product)
 
 
 @app.put("/products/<pid>")
@@ -180,55 +368,55 @@ def get_product(pid: str):
 def update_product(pid: str):
     body = get_body()
 
-    with _lock:
-        data = load_db()
-        products = data["products"]
-        p_index = index_by_id(products)
-
-        if pid not in p_index:
-            return not_found("product not found")
-
-        # Update fields if provided
-        if "name" in body:
-            p_index[pid]["name"] = str(body["name"])
-        if "price" in body:
-            try:
-                p_index[pid]["price"] = float(body["price"])
-            except Exception:
-                return bad_request("Field 'price' must be a number")
-
-        # Write back by rebuilding list in same order
-        for i, p in enumerate(products):
-            if str(p.get("id")) == pid:
-                products[i] = p_index[pid]
-                break
-
-        save_db(data)
-        return jsonify(p_index[pid]), 200
+    # Update fields if provided; validate before touching the stored record
+    changes: Dict[str, Any] = {}
+    if "name" in body:
+        changes["name"] = canon(str(body["name"]))
+    if "price" in body:
+        changes["price"] = parse_price(body["price"])
+        if changes["price"] is None:
+            return bad_request(INVALID_PRICE)
+    if encode_record(changes) is None:
+        return bad_request(INVALID_TEXT)
+
+    def update() -> Optional[Product]:
+        product = db.get_product(pid)
+        if product is None:
+            return None
+        product = msgspec.structs.replace(product, **changes)
+        db.update_product(product)
+        return product
+
+    def change(data: Dict[str, Any]) -> None:
+        # The list holds the same object as the index, so this updates both
+        product = data["products_by_id"][pid]
+        for field, value in changes.items():
+            setattr(product, field, value)
+        touch("products")
+
+    product = write(update, change)
+    if product is None:
+        return not_found("product not found")
+    return json_response(product)
 
 
 @app.delete("/products/<pid>")
 @require_api_key
 def delete_product(pid: str):
-    with _lock:
-        data = load_db()
+    def remove(data: Dict[str, Any]) -> None:
         products = data["products"]
-        orders = data["orders"]
-
-        before = len(products)
-        products[:] = [p for p in products if str(p.get("id")) != pid]
-        if len(products) == before:
-            return not_found("product not found")
+        products[:] = [p for p in products if p.id != pid]
+        del data["products_by_id"][pid]
 
-        # Optional: remove product from any orders (or keep as history; choose one)
-        # Here: remove any order items referencing deleted product
-        for o in orders:
-            if isinstance(o, dict) and isinstance(o.get("items"), list):
-                o["items"] = [it for it in o["items"] if str(it.get("productId")) != pid]
+        # Remove any order items referencing deleted product (db.py does the same in SQL)
+        for o in data["orders"]:
+            if any(it.product_id == pid for it in o.items):
+                o.items = [it for it in o.items if it.product_id != pid]
+        touch("products")
 
-        save_db(data)
-
-    return jsonify({"deleted": pid}), 200
+    if not write(lambda: db.delete_product(pid), remove):
+        return not_found("product not found")
+    return json_response({"deleted": pid})
 
 
 # =========================================================
@@ -237,8 +425,9 @@ def delete_product(pid: str):
 @app.get("/orders")
 @require_api_key
 def list_orders():
-    data = load_db()
-    return jsonify(data["orders"]), 200
+    # Stream a copy of the list, so concurrent writes can't shift it mid-response
+    orders = list(load_db()["orders"])
+    return Response(stream_list(orders), mimetype="application/json")
 
 
 @app.post("/orders")
@@ -254,57 +443,52 @@ def create_order():
     if not isinstance(items, list) or len(items) == 0:
         return bad_request("Field 'items' must be a non-empty list")
 
-    with _lock:
-        data = load_db()
-        products_index = index_by_id(data["products"])
-        orders = data["orders"]
-        o_index = index_by_id(orders)
-
-        # Validate items: each needs productId and qty
-        normalized_items = []
-        for it in items:
-            if not isinstance(it, dict):
-                return bad_request("Each item must be an object with productId and qty")
-            product_id = str(it.get("productId", "")).strip()
-            qty = it.get("qty")
-            if not product_id:
-                return bad_request("Each item must include productId")
-            if product_id not in products_index:
-                return bad_request(f"productId does not exist: {product_id}")
-            try:
-                qty_val = int(qty)
-                if qty_val <= 0:
-                    return bad_request("qty must be a positive integer")
-            except Exception:
-                return bad_request("qty must be an integer")
-
-            normalized_items.append({"productId": product_id, "qty": qty_val})
-
-        oid = str(body.get("id") or f"o-{uuid.uuid4().hex[:8]}")
-        if oid in o_index:
-            return bad_request("Order id already exists")
-
-        order = {
-            "id": oid,
-            "customer": str(customer),
-            "items": normalized_items,
-            "status": str(status),
-            "createdAt": now_iso()
-        }
-        orders.append(order)
-        save_db(data)
-
-    return jsonify(order), 201
+    # Validate items: each needs productId and qty
+    normalized_items, error = normalize_items(items)
+    if error:
+        return bad_request(error)
+
+    oid = str(body.get("id") or f"o-{uuid.uuid4().hex[:8]}")
+    order = Order(
+        id=oid,
+        customer=canon(str(customer)),
+        items=normalized_items,
+        status=canon_status(str(status)),
+        created_at=now_iso()
+    )
+    raw = encode_record(order)
+    if raw is None:
+        return bad_request(INVALID_TEXT)
+
+    def insert() -> str:
+        error = check_products(order.items)
+        if error:
+            return error
+        if not db.insert_order(order):
+            return "Order id already exists"
+        return ""
+
+    def add(data: Dict[str, Any]) -> None:
+        share_product_ids(order.items, data["products_by_id"])
+        data["orders"].append(order)
+        data["orders_by_id"][oid] = order
+
+    error = write(insert, add)
+    if error:
+        return bad_request(error)
+    return raw_response(raw, 201)
 
 
 @app.get("/orders/<oid>")
 @require_api_key
 def get_order(oid: str):
-    data = load_db()
-    o_index = index_by_id(data["orders"])
-    if oid not in o_index:
+    order = load_db()["orders_by_id"].get(oid)
+    if order is None:
+        # It may have just been created by another worker; check before a 404
+        order = load_db(force=True)["orders_by_id"].get(oid)
+    if order is None:
         return not_found("order not found")
-    return jsonify(o_index[oid]), 200
+    return json_response(order)
 
 
 @app.put("/orders/<oid>")
@@ -312,68 +496,63 @@ def get_order(oid: str):
 def update_order(oid: str):
     body = get_body()
 
-    with _lock:
-        data = load_db()
-        orders = data["orders"]
-        o_index = index_by_id(orders)
-
-        if oid not in o_index:
-            return not_found("order not found")
-
-        # Allow updating status/customer (and optionally items)
-        if "status" in body:
-            o_index[oid]["status"] = str(body["status"])
-        if "customer" in body:
-            o_index[oid]["customer"] = str(body["customer"])
-
-        if "items" in body:
-            if not isinstance(body["items"], list) or len(body["items"]) == 0:
-                return bad_request("items must be a non-empty list")
-
-            products_index = index_by_id(data["products"])
-            new_items = []
-            for it in body["items"]:
-                if not isinstance(it, dict):
-                    return bad_request("Each item must be an object with productId and qty")
-                product_id = str(it.get("productId", "")).strip()
-                qty = it.get("qty")
-                if not product_id:
-                    return bad_request("Each item must include productId")
-                if product_id not in products_index:
-                    return bad_request(f"productId does not exist: {product_id}")
-                try:
-                    qty_val = int(qty)
-                    if qty_val <= 0:
-                        return bad_request("qty must be a positive integer")
-                except Exception:
-                    return bad_request("qty must be an integer")
-                new_items.append({"productId": product_id, "qty": qty_val})
-
-            o_index[oid]["items"] = new_items
-
-        # Write back into list
-        for i, o in enumerate(orders):
-            if str(o.get("id")) == oid:
-                orders[i] = o_index[oid]
-                break
-
-        save_db(data)
-        return jsonify(o_index[oid]), 200
+    # Allow updating status/customer (and optionally items)
+    changes: Dict[str, Any] = {}
+    if "status" in body:
+        changes["status"] = canon_status(str(body["status"]))
+    if "customer" in body:
+        changes["customer"] = canon(str(body["customer"]))
+
+    if "items" in body:
+        if not isinstance(body["items"], list) or len(body["items"]) == 0:
+            return bad_request("items must be a non-empty list")
+
+        new_items, error = normalize_items(body["items"])
+        if error:
+            return bad_request(error)
+        changes["items"] = new_items
+    if encode_record(changes) is None:
+        return bad_request(INVALID_TEXT)
+
+    def update() -> Tuple[Optional[Order], str]:
+        order = db.get_order(oid)
+        if order is None:
+            return None, ""
+        if "items" in changes:
+            error = check_products(changes["items"])
+            if error:
+                return None, error
+        order = msgspec.structs.replace(order, **changes)
+        db.update_order(order)
+        return order, ""
+
+    def change(data: Dict[str, Any]) -> None:
+        # The list holds the same object as the index, so this updates both
+        order = data["orders_by_id"][oid]
+        if "items" in changes:
+            share_product_ids(changes["items"], data["products_by_id"])
+        for field, value in changes.items():
+            setattr(order, field, value)
+
+    order, error = write(update, change)
+    if error:
+        return bad_request(error)
+    if order is None:
+        return not_found("order not found")
+    return json_response(order)
 
 
 @app.delete("/orders/<oid>")
 @require_api_key
 def delete_order(oid: str):
-    with _lock:
-        data = load_db()
+    def remove(data: Dict[str, Any]) -> None:
         orders = data["orders"]
-        before = len(orders)
-        orders[:] = [o for o in orders if str(o.get("id")) != oid]
-        if len(orders) == before:
-            return not_found("order not found")
-        save_db(data)
+        orders[:] = [o for o in orders if o.id != oid]
+        del data["orders_by_id"][oid]
 
-    return jsonify({"deleted": oid}), 200
+    if not write(lambda: db.delete_order(oid), remove):
+        return not_found("order not found")
+    return json_response({"deleted": oid})
 
 
 if __name__ == "__main__":
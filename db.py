@@ -0,0 +1,421 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import msgspec
+
+from models import Order, OrderItem, Product, canon, canon_status
+
+BASE_DIR = Path(__file__).resolve().parent
+DATA_DIR = BASE_DIR / "data"
+DATA_DIR.mkdir(exist_ok=True)
+
+# You can override the DB file path if needed:
+#   set DB_PATH=C:\path\to\db.sqlite3
+DB_PATH = Path(os.getenv("DB_PATH", str(DATA_DIR / "db.sqlite3")))
+
+# How hard SQLite fsyncs on commit (https://sqlite.org/pragma.html#pragma_synchronous):
+#   FULL   - fsync the WAL on every commit; survives power loss
+#   NORMAL - fsync only at checkpoints; commits stay atomic (default)
+#   OFF    - never fsync; for local development only
+DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL").upper()
+if DB_SYNCHRONOUS not in ("FULL", "NORMAL", "OFF"):
+    raise ValueError(f"DB_SYNCHRONOUS must be FULL, NORMAL or OFF, got {DB_SYNCHRONOUS!r}")
+
+# Seconds a write waits for another process to release SQLite's write lock
+# before giving up with DatabaseBusy (the API answers 503)
+DB_BUSY_TIMEOUT = float(os.getenv("DB_BUSY_TIMEOUT", "5"))
+
+# Old JSON store; imported once when the SQLite DB is first created
+LEGACY_JSON_PATH = DATA_DIR / "db.json"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    price REAL,
+    created_at TEXT
+);
+CREATE TABLE IF NOT EXISTS orders (
+    id TEXT PRIMARY KEY,
+    customer TEXT,
+    status TEXT,
+    created_at TEXT,
+    items TEXT
+);
+-- seq counts commits that changed data; caches compare it to see if they're stale
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (name, value) VALUES ('seq', 0);
+"""
+
+
+# -----------------------------
+# Connections
+# Writes go through one connection per process, used only by the writer
+# thread (and the schema setup before it starts); `lock` guards it.
+# write() hands each job to that thread, which runs whatever has queued up
+# in one BEGIN IMMEDIATE ... COMMIT (group commit) and only then wakes the
+# callers. BEGIN IMMEDIATE is SQLite's write lock across processes.
+# Reads (seq checks and cache reloads) use a connection per thread and take
+# no lock, so they never wait on a writer. WAL lets them run while another
+# connection is writing.
+# -----------------------------
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(str(DB_PATH), timeout=DB_BUSY_TIMEOUT, check_same_thread=False,
+                           isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA synchronous={DB_SYNCHRONOUS}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+
+_fresh = not DB_PATH.exists()
+_conn = _connect()
+lock = threading.RLock()
+_local = threading.local()
+
+
+def _reader() -> sqlite3.Connection:
+    """This thread's read-only connection."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _local.conn = _connect()
+        conn.execute("PRAGMA query_only=ON")
+    return conn
+
+
+class DatabaseBusy(Exception):
+    """Another process held the write lock for longer than DB_BUSY_TIMEOUT."""
+
+
+@contextmanager
+def transaction() -> Iterator[sqlite3.Connection]:
+    """BEGIN IMMEDIATE ... COMMIT; nested calls join the outer transaction.
+
+    BEGIN IMMEDIATE takes SQLite's write lock up front (waiting up to
+    DB_BUSY_TIMEOUT for other processes, else DatabaseBusy), so everything
+    inside runs against the latest committed data and no other worker can
+    write until COMMIT.
+    """
+    with lock:
+        if _conn.in_transaction:
+            yield _conn
+            return
+        try:
+            _conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError as e:
+            if e.sqlite_errorcode & 0xFF == sqlite3.SQLITE_BUSY:
+                raise DatabaseBusy() from e
+            raise
+        try:
+            yield _conn
+            _conn.execute("COMMIT")
+        except BaseException:
+            if _conn.in_transaction:
+                _conn.execute("ROLLBACK")
+            raise
+
+
+# Most jobs one COMMIT takes; bounds how long a batch holds the write lock
+GROUP_COMMIT_MAX = 100
+
+
+class _Write:
+    __slots__ = ("job", "apply", "done", "result", "error", "seq")
+
+    def __init__(self, job: Callable[[], Any], apply: Optional[Callable[[int, Any], None]]):
+        self.job = job
+        self.apply = apply
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.seq: Optional[int] = None
+
+
+_pending: "queue.SimpleQueue[_Write]" = queue.SimpleQueue()
+
+
+def write(job: Callable[[], Any], apply: Optional[Callable[[int, Any], None]] = None) -> Any:
+    """Runs job() in the next group commit and returns its result after COMMIT.
+
+    job does its checks and writes with the single-row functions below. It
+    runs in its own savepoint: if it raises, its writes are undone and the
+    exception is re-raised here, the rest of the batch is unaffected. If it
+    changed any rows, the commit bumps seq and apply(seq, result) is called
+    after COMMIT, seq being the value just before this job. Jobs, and their
+    apply calls, run one at a time on the writer thread in commit order.
+    Raises DatabaseBusy if the batch couldn't get the write lock.
+    """
+    w = _Write(job, apply)
+    _pending.put(w)
+    w.done.wait()
+    if w.error is not None:
+        raise w.error
+    return w.result
+
+
+def _writer() -> None:
+    while True:
+        # Everything queued while the previous batch committed shares this COMMIT
+        batch = [_pending.get()]
+        while len(batch) < GROUP_COMMIT_MAX:
+            try:
+                batch.append(_pending.get_nowait())
+            except queue.Empty:
+                break
+        _commit(batch)
+        for w in batch:
+            w.done.set()
+
+
+def _commit(batch: List[_Write]) -> None:
+    try:
+        with transaction() as conn:
+            seq = start = _read_seq(conn)
+            for w in batch:
+                conn.execute("SAVEPOINT job")
+                before = conn.total_changes
+                try:
+                    w.result = w.job()
+                except Exception as e:
+                    conn.execute("ROLLBACK TO job")
+                    w.error = e
+                else:
+                    if conn.total_changes != before:
+                        w.seq = seq
+                        seq += 1
+                conn.execute("RELEASE job")
+            if seq != start:
+                conn.execute("UPDATE meta SET value = ? WHERE name = 'seq'", (seq,))
+    except Exception as e:
+        # Nothing in the batch was committed
+        for w in batch:
+            w.error, w.seq = e, None
+        return
+
+    for w in batch:
+        if w.seq is not None and w.apply is not None:
+            try:
+                w.apply(w.seq, w.result)
+            except Exception as e:
+                w.error = e
+
+
+def _read_seq(conn: sqlite3.Connection) -> int:
+    return conn.execute("SELECT value FROM meta WHERE name = 'seq'").fetchone()[0]
+
+
+def read_seq() -> int:
+    """Changes whenever a write commits, in this or any other process."""
+    return _read_seq(_reader())
+
+
+def snapshot() -> Tuple[int, List[Product], List[Order]]:
+    """seq plus every product and order, all read from one state of the file."""
+    conn = _reader()
+    conn.execute("BEGIN")
+    try:
+        return _read_seq(conn), list_products(), list_orders()
+    finally:
+        conn.execute("COMMIT")
+
+
+def ensure_db_exists() -> None:
+    with lock:
+        _conn.executescript(SCHEMA)
+    if _fresh and LEGACY_JSON_PATH.exists():
+        import_json(LEGACY_JSON_PATH)
+
+
+def import_json(path: Path) -> None:
+    content = path.read_bytes().strip()
+    data = msgspec.json.decode(content) if content else {}
+    # Legacy records may miss fields; store defaults rather than NULLs so
+    # every row loads back into a Product/Order
+    with transaction() as conn:
+        for p in data.get("products") or []:
+            if not isinstance(p, dict) or p.get("id") is None:
+                continue
+            conn.execute(
+                "INSERT OR IGNORE INTO products (id, name, price, created_at) VALUES (?, ?, ?, ?)",
+                (str(p["id"]), str(p.get("name") or ""), _legacy_price(p.get("price")),
+                 str(p.get("createdAt") or "")),
+            )
+        for o in data.get("orders") or []:
+            if not isinstance(o, dict) or o.get("id") is None:
+                continue
+            conn.execute(
+                "INSERT OR IGNORE INTO orders (id, customer, status, created_at, items) VALUES (?, ?, ?, ?, ?)",
+                (str(o["id"]), str(o.get("customer") or ""), str(o.get("status") or "NEW"),
+                 str(o.get("createdAt") or ""), _dump_items(_legacy_items(o.get("items")))),
+            )
+
+
+def _legacy_price(price: Any) -> float:
+    try:
+        return float(price)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _legacy_items(items: Any) -> List[Dict[str, Any]]:
+    """Keeps only items with a productId and an integer qty."""
+    out = []
+    for it in items if isinstance(items, list) else []:
+        if not isinstance(it, dict) or not it.get("productId"):
+            continue
+        try:
+            qty = int(it.get("qty"))
+        except (TypeError, ValueError):
+            continue
+        out.append({"productId": str(it["productId"]), "qty": qty})
+    return out
+
+
+# -----------------------------
+# Row <-> API object
+# -----------------------------
+_items_decoder = msgspec.json.Decoder(List[OrderItem])
+
+
+def _dump_items(items: List[Any]) -> str:
+    # Stored as TEXT: SQLite's json_* functions would treat a BLOB as binary JSONB
+    return msgspec.json.encode(items).decode()
+
+
+# Rows written before import_json filled in defaults may still hold NULLs
+def _product(row: sqlite3.Row) -> Product:
+    price = row["price"]
+    return Product(row["id"], canon(row["name"] or ""), 0.0 if price is None else price,
+                   row["created_at"] or "")
+
+
+def _order(row: sqlite3.Row) -> Order:
+    # Repeated statuses and customers share one string each; item product ids
+    # are pointed at their product's id by the cache (app.share_product_ids)
+    items = _items_decoder.decode(row["items"] or "[]")
+    return Order(row["id"], canon(row["customer"] or ""), items, canon_status(row["status"] or "NEW"),
+                 row["created_at"] or "")
+
+
+# -----------------------------
+# Products
+# -----------------------------
+# Only orders that reference the product are rewritten
+STRIP_PRODUCT_SQL = """
+UPDATE orders SET items = (
+    SELECT json_group_array(json(value)) FROM json_each(orders.items)
+    WHERE json_extract(value, '$.productId') != ?
+)
+WHERE EXISTS (
+    SELECT 1 FROM json_each(orders.items)
+    WHERE json_extract(value, '$.productId') = ?
+)
+"""
+
+
+def list_products() -> List[Product]:
+    rows = _reader().execute("SELECT * FROM products ORDER BY rowid").fetchall()
+    return [_product(r) for r in rows]
+
+
+# get_*/missing_products and the writes use the write connection; call them
+# from write() jobs, where they see the latest data of every process
+def get_product(pid: str) -> Optional[Product]:
+    with lock:
+        row = _conn.execute("SELECT * FROM products WHERE id = ?", (pid,)).fetchone()
+    return None if row is None else _product(row)
+
+
+def missing_products(pids: List[str]) -> List[str]:
+    """The ids in pids (in order) that have no product."""
+    unique = list(dict.fromkeys(pids))
+    with lock:
+        found = {r[0] for r in _conn.execute(
+            f"SELECT id FROM products WHERE id IN ({', '.join('?' * len(unique))})", unique
+        )}
+    return [pid for pid in pids if pid not in found]
+
+
+def insert_product(p: Product) -> bool:
+    """Returns False if the id is already taken."""
+    try:
+        with lock:
+            _conn.execute(
+                "INSERT INTO products (id, name, price, created_at) VALUES (?, ?, ?, ?)",
+                (p.id, p.name, p.price, p.created_at),
+            )
+    except sqlite3.IntegrityError:
+        return False
+    return True
+
+
+def update_product(p: Product) -> bool:
+    """Returns False if the product no longer exists."""
+    with lock:
+        return _conn.execute(
+            "UPDATE products SET name = ?, price = ? WHERE id = ?",
+            (p.name, p.price, p.id),
+        ).rowcount > 0
+
+
+def delete_product(pid: str) -> bool:
+    """Deletes the product and strips it from every order's items."""
+    with transaction() as conn:
+        if conn.execute("DELETE FROM products WHERE id = ?", (pid,)).rowcount == 0:
+            return False
+        conn.execute(STRIP_PRODUCT_SQL, (pid, pid))
+    return True
+
+
+# -----------------------------
+# Orders
+# -----------------------------
+def list_orders() -> List[Order]:
+    rows = _reader().execute("SELECT * FROM orders ORDER BY rowid").fetchall()
+    return [_order(r) for r in rows]
+
+
+def get_order(oid: str) -> Optional[Order]:
+    with lock:
+        row = _conn.execute("SELECT * FROM orders WHERE id = ?", (oid,)).fetchone()
+    return None if row is None else _order(row)
+
+
+def insert_order(o: Order) -> bool:
+    """Returns False if the id is already taken."""
+    try:
+        with lock:
+            _conn.execute(
+                "INSERT INTO orders (id, customer, status, created_at, items) VALUES (?, ?, ?, ?, ?)",
+                (o.id, o.customer, o.status, o.created_at, _dump_items(o.items)),
+            )
+    except sqlite3.IntegrityError:
+        return False
+    return True
+
+
+def update_order(o: Order) -> bool:
+    """Returns False if the order no longer exists."""
+    with lock:
+        return _conn.execute(
+            "UPDATE orders SET customer = ?, status = ?, items = ? WHERE id = ?",
+            (o.customer, o.status, _dump_items(o.items), o.id),
+        ).rowcount > 0
+
+
+def delete_order(oid: str) -> bool:
+    with lock:
+        return _conn.execute("DELETE FROM orders WHERE id = ?", (oid,)).rowcount > 0
+
+
+ensure_db_exists()
+threading.Thread(target=_writer, name="db-writer", daemon=True).start()
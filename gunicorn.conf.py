@@ -0,0 +1,16 @@
+# Gunicorn settings; picked up automatically when started from this directory:
+#   gunicorn wsgi:app
+#
+# Each worker process keeps its own in-memory cache and reloads it when
+# another worker commits to the SQLite file (see load_db in app.py).
+# Writes are safe across workers: every write handler validates and commits
+# inside a BEGIN IMMEDIATE transaction (SQLite's cross-process write lock)
+# and responds only after COMMIT.
+import os
+import multiprocessing
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+worker_class = "gthread"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+timeout = 60
@@ -0,0 +1,67 @@
+import sys
+import threading
+from collections import OrderedDict
+from typing import List
+
+import msgspec
+
+
+# -----------------------------
+# Records kept in the in-memory cache
+# snake_case attributes, camelCase in JSON (createdAt, productId)
+# -----------------------------
+class Product(msgspec.Struct, rename="camel"):
+    id: str
+    name: str
+    price: float
+    created_at: str
+
+
+class OrderItem(msgspec.Struct, rename="camel"):
+    product_id: str
+    qty: int
+
+
+class Order(msgspec.Struct, rename="camel"):
+    id: str
+    customer: str
+    items: List[OrderItem]
+    status: str
+    created_at: str
+
+
+# -----------------------------
+# String pool
+# Product names and customers repeat a lot; canon() hands back one shared
+# copy per distinct value. Least recently used entries are dropped past
+# STRPOOL_MAX (records keep their strings, later duplicates just aren't shared).
+# -----------------------------
+STRPOOL_MAX = 10_000
+
+_STRPOOL: "OrderedDict[str, str]" = OrderedDict()
+_strpool_lock = threading.Lock()
+
+
+def canon(s: str) -> str:
+    with _strpool_lock:
+        shared = _STRPOOL.get(s)
+        if shared is not None:
+            _STRPOOL.move_to_end(s)
+            return shared
+        _STRPOOL[s] = s
+        if len(_STRPOOL) > STRPOOL_MAX:
+            _STRPOOL.popitem(last=False)
+        return s
+
+
+# -----------------------------
+# Order statuses
+# The known statuses share one interned string each. Anything else goes
+# through the bounded pool, never sys.intern: client input must not grow the
+# interned set (interned strings are immortal on CPython 3.12+).
+# -----------------------------
+STATUSES = {s: sys.intern(s) for s in ("NEW", "PAID", "SHIPPED", "CANCELLED")}
+
+
+def canon_status(s: str) -> str:
+    return STATUSES.get(s) or canon(s)
@@ -0,0 +1,3 @@
+# WSGI entrypoint for production servers:
+#   gunicorn wsgi:app
+from app import app  # noqa: F401